@@ -5,6 +5,10 @@ import re
 from copy import copy, deepcopy
 import numpy as np
 import logging
+import json
+import time
+import argparse
+import threading
 from itertools import product
 
 class Literal():
@@ -77,9 +81,39 @@ class KB():
     supporting arbitrary PL sentences.
     """
     def __init__(self, filename=None):
-        from cnf import convert_to_cnf
-        self.vars = set()
-        self.clauses = set()
+        # A KB made by .fork() looks through to its parent for everything the
+        # parent knows, and only stores what's been added to (and removed
+        # from) it since. For a KB with no parent, the "own" sets are simply
+        # everything.
+        self.parent = None
+        self.own_vars = set()
+        self.own_clauses = set()
+        self.removed_clauses = set()
+        # XOR constraints are kept as-is, rather than being blown up into CNF,
+        # as rows of a system of equations over GF(2): each is a (mask,
+        # parity) pair, where bit i of mask stands for variable xor_vars[i].
+        # The numbering (xor_vars, and xor_index, its inverse) only ever
+        # grows, and is shared by a KB and all its forks, so a variable has
+        # the same bit in all of them. (It's not part of what a KB knows, so
+        # sharing it leaks nothing between them.) xor_lock guards it, since
+        # forks may be told things in different threads (see kb_server.py).
+        self.own_xors = set()
+        self.removed_xors = set()
+        self.xor_vars = []
+        self.xor_index = {}
+        self.xor_lock = threading.Lock()
+        # Running totals of how hard the solver has worked (see solve_rec()).
+        self.stats = { "nodes": 0, "decisions": 0, "conflicts": 0 }
+        # What the model counter has learned, and the model counts it's come
+        # up with, kept from one call to the next, per set of weights. (See
+        # .count_models().) changes goes up with every .tell() and .retract(),
+        # so we can tell when a count is out of date.
+        self.changes = 0
+        self.count_caches = {}
+        self.model_counts = {}
+        # A fork's merged .vars, .clauses and .xors, when they differ from its
+        # parent's, kept until it or its parent changes. See .merged().
+        self.views = {}
         if filename:
             already_in_cnf = filename.endswith('.cnf')
             # If the file whose name is passed is known to already be in CNF,
@@ -88,23 +122,83 @@ class KB():
                 for clause_line in [ l.strip() for l in f.readlines() ]:
                     if not clause_line.startswith("#"):
                         if not already_in_cnf:
-                            clauses = convert_to_cnf(clause_line)
-                            for clause in clauses:
-                                self.add_clause(clause)
+                            self.tell(clause_line)
                         else:
                             self.add_clause(Clause.parse(clause_line))
             for c in self.clauses:
-                self.vars |= { l.var for l in c.lits }
+                self.own_vars |= { l.var for l in c.lits }
+
+    @property
+    def vars(self):
+        if self.parent is None:
+            return self.own_vars
+        parent_vars = self.parent.vars
+        if self.own_vars <= parent_vars:
+            return parent_vars
+        return self.merged("vars", lambda: parent_vars | self.own_vars)
+
+    @property
+    def clauses(self):
+        if self.parent is None:
+            return self.own_clauses
+        if not self.own_clauses  and  not self.removed_clauses:
+            return self.parent.clauses
+        return self.merged("clauses", lambda:
+            (self.parent.clauses - self.removed_clauses) | self.own_clauses)
+
+    @property
+    def xors(self):
+        if self.parent is None:
+            return self.own_xors
+        if not self.own_xors  and  not self.removed_xors:
+            return self.parent.xors
+        return self.merged("xors", lambda:
+            (self.parent.xors - self.removed_xors) | self.own_xors)
+
+    def merged(self, name, build):
+        """
+        Return this fork's merged view of the passed name (built by calling
+        the passed function), building it only if this KB or one it was
+        forked from has changed since it was last built. (A fork that hasn't
+        changed something just hands back its parent's, without calling
+        this, so only forks that differ from their parents pay for a copy.
+        Callers must not change what's returned.)
+        """
+        state = self.state()
+        if name not in self.views  or  self.views[name][0] != state:
+            self.views[name] = (state, build())
+        return self.views[name][1]
+
+    def fork(self):
+        """
+        Return a new KB that starts out knowing everything this one does, for
+        trying out hypotheticals. Nothing is copied: the fork looks through
+        to this KB for its contents, and records only its own .tell()s and
+        .retract()s, so it's cheap to make, and to throw away when done.
+        Forks can themselves be forked. Note that a fork also sees any later
+        changes to this KB, so don't change a KB while its forks are in use
+        unless that's what you want.
+        """
+        child = KB()
+        child.parent = self
+        child.xor_vars = self.xor_vars
+        child.xor_index = self.xor_index
+        child.xor_lock = self.xor_lock
+        return child
 
     def tell(self, fact):
         """
         Update this KB by adding the passed fact (represented as a string of
         propositional logic), but only the clauses in that CNF'd fact that we
-        don't already know (see .add_clause()).
+        don't already know (see .add_clause()). Any XORs at the top level of
+        the fact are kept as native XOR constraints (see .add_xor()).
         """
-        from cnf import convert_to_cnf
-        for clause in convert_to_cnf(fact):
+        from cnf import convert_to_cnf_and_xors
+        clauses, xors = convert_to_cnf_and_xors(fact)
+        for clause in clauses:
             self.add_clause(clause)
+        for variables, parity in xors:
+            self.add_xor(variables, parity)
 
     def retract(self, fake_news):
         """
@@ -114,14 +208,18 @@ class KB():
         news wasn't directly previously inserted, but rather was derived from
         previous facts.
         """
-        from cnf import convert_to_cnf
+        from cnf import convert_to_cnf_and_xors
+        retracted_clauses, retracted_xors = convert_to_cnf_and_xors(fake_news)
         clauses_to_remove = set()
-        for retracted_clause in convert_to_cnf(fake_news):
+        for retracted_clause in retracted_clauses:
             for clause in self.clauses:
                 if retracted_clause.equivalent_to(clause):
                     clauses_to_remove |= {clause}
         for clause in clauses_to_remove:
             self.remove_clause(clause)
+        for variables, parity in retracted_xors:
+            if all([ self.xor_number(v) is not None for v in variables ]):
+                self.remove_xor(self.xor_mask(variables), parity)
 
     def ask(self, hypothesis):
         """
@@ -164,6 +262,71 @@ class KB():
                 return False
         return True
 
+    def count_models(self, weights=None):
+        """
+        Return the number of assignments to this KB's variables that satisfy
+        it. If a dict mapping variables to the probability they're True is
+        passed, return the weighted model count instead (see count.py).
+        """
+        key = frozenset(weights.items()) if weights else None
+        state = self.state()
+        if key in self.model_counts  and  self.model_counts[key][0] == state:
+            return self.model_counts[key][1]
+        from count import count_models
+        count = count_models(self.clauses, self.vars, weights,
+            self.xor_list(), self.count_cache(weights))
+        self.model_counts[key] = (state, count)
+        return count
+
+    def probability(self, hypothesis, weights=None):
+        """
+        Given a string of propositional logic, return the fraction of this
+        KB's models in which it is True. (If a dict of weights is passed, as
+        with .count_models(), the models are weighted accordingly.) Any
+        variables in the hypothesis the KB knows nothing about are taken to
+        be equally likely True or False, unless weighted otherwise.
+        """
+        from cnf import convert_to_cnf
+        total = self.count_models(weights)
+        if total == 0:
+            raise ValueError("KB is inconsistent; it has no models.")
+        hypo_clauses = convert_to_cnf(hypothesis)
+        all_vars = set(self.vars)
+        for c in hypo_clauses:
+            all_vars |= c.get_vars()
+        for var in all_vars - self.vars:
+            # A new variable doubles the count, unless it's weighted (in which
+            # case its weights add up to 1).
+            if not (weights and var in weights):
+                total *= 2
+        from count import count_models
+        hits = count_models(self.clauses | hypo_clauses, all_vars, weights,
+            self.xor_list(), self.count_cache(weights))
+        return hits / total
+
+    def count_cache(self, weights=None):
+        """
+        Return the CountCache (see count.py) for counting this KB's models
+        with the passed weights.
+        """
+        from count import CountCache
+        key = frozenset(weights.items()) if weights else None
+        if key not in self.count_caches:
+            if len(self.count_caches) >= 8:
+                # Don't hang on to caches for every set of weights ever used.
+                self.count_caches.clear()
+            self.count_caches[key] = CountCache()
+        return self.count_caches[key]
+
+    def state(self):
+        """
+        Return a value that changes whenever the contents of this KB (or of
+        the KB it was forked from) do.
+        """
+        if self.parent is None:
+            return (self.changes,)
+        return (self.changes,) + self.parent.state()
+
     def audit(self):
         """
         Return a dict whose keys are the variables of this KB, and whose
@@ -206,18 +369,98 @@ class KB():
         # Don't redundantly add this clause if we already have an equivalent
         # one in the KB.
         if not any([ clause.equivalent_to(c) for c in self.clauses ]):
-            self.clauses |= {clause}
-            self.vars |= { l.var for l in clause.lits }
+            self.own_clauses |= {clause}
+            self.own_vars |= { l.var for l in clause.lits }
+            self.changes += 1
 
     def remove_clause(self, clause):
-        self.clauses -= {clause}
+        self.changes += 1
+        if clause in self.own_clauses:
+            self.own_clauses -= {clause}
+        elif self.parent is not None:
+            self.removed_clauses |= {clause}
+
+    def add_xor(self, variables, parity):
+        """
+        Add the constraint that an odd (if parity is 1) or even (if parity is
+        0) number of the passed variables are True.
+        """
+        with self.xor_lock:
+            for var in variables:
+                if var not in self.xor_index:
+                    self.xor_index[var] = len(self.xor_vars)
+                    self.xor_vars.append(var)
+        xor = (self.xor_mask(variables), parity)
+        self.own_xors |= {xor}
+        self.removed_xors -= {xor}
+        self.own_vars |= set(variables)
+        self.changes += 1
+
+    def remove_xor(self, mask, parity):
+        self.changes += 1
+        self.own_xors -= {(mask, parity)}
+        if self.parent is not None:
+            self.removed_xors |= {(mask, parity)}
+
+    def xor_mask(self, variables):
+        """
+        Return the bitmask (int) for the passed XOR variables. A variable
+        passed twice cancels itself out, as it does in an XOR.
+        """
+        mask = 0
+        for var in variables:
+            mask ^= 1 << self.xor_number(var)
+        return mask
+
+    def xor_number(self, var):
+        """
+        Return the bit number of the passed XOR variable, or None if no XOR
+        has used it yet.
+        """
+        return self.xor_index.get(var)
+
+    def xor_var(self, number):
+        """
+        Return the XOR variable with the passed bit number.
+        """
+        return self.xor_vars[number]
+
+    def xor_members(self, mask):
+        """
+        Return a list of the variables whose bits are set in the passed mask.
+        """
+        members = []
+        while mask:
+            bit = mask & -mask
+            members.append(self.xor_var(bit.bit_length() - 1))
+            mask ^= bit
+        return members
+
+    def xor_list(self):
+        """
+        Return this KB's XOR constraints as a list of (list of variables,
+        parity) pairs.
+        """
+        return [ (self.xor_members(m), p) for m, p in self.xors ]
+
+    def xor_clauses(self, cut=None):
+        """
+        Return a set of Clauses equivalent to this KB's XOR constraints, for
+        when plain CNF is needed. Only if a cut length is passed are XORs
+        longer than that chained together with new "cut" variables (see
+        cnf.xors_to_clauses()).
+        """
+        from cnf import xors_to_clauses
+        return xors_to_clauses(self.xor_list(), self.vars, cut)
 
     def evalu(self, assignments):
         """
         Given a dict of variables to values, return True if this KB is True
         under that assignment.
         """
-        return all([ c.evalu(assignments) for c in self.clauses ])
+        return (all([ c.evalu(assignments) for c in self.clauses ])  and
+            all([ sum([ assignments[v] for v in self.xor_members(mask) ]) % 2
+                == parity for mask, parity in self.xors ]))
 
     def propagate_units(self, remaining_clauses, assignments):
         """
@@ -239,7 +482,7 @@ class KB():
                     if the_lit.neg != (not assignments[the_lit.var]):
                         # Houston, we have a problem. We have at least two unit
                         # clauses with opposite polarity!
-                        sys.exit(f"Inherently incompatible {the_lit.var}.")
+                        return False
                 assignments[the_lit.var] = not the_lit.neg
                 remaining_clauses -= {unit_clause}
 
@@ -263,18 +506,83 @@ class KB():
                     if c.contains_literal(negated_form):
                         c.remove_literal(negated_form)
             continue
+        return True
+
+    def propagate_xors(self, pivots, applied, assignments):
+        """
+        Bring the passed reduced XOR system (a list of (pivot bit, mask,
+        parity) rows in Gauss-Jordan form; see eliminate_xors()) up to date
+        with the assignments made so far. Only the variables assigned since
+        the system was last brought up to date (i.e., those not in the
+        applied mask passed) are plugged in, and only the rows that lose
+        their pivot to one of them need eliminating again. Return the new
+        (pivots, applied) pair, or None if the rows turn out to be
+        contradictory. Any row with only its pivot left in it forces that
+        variable's value.
+        """
+        new_mask = 0
+        true_mask = 0
+        for var, value in assignments.items():
+            number = self.xor_number(var)
+            if number is not None:
+                bit = 1 << number
+                if not applied & bit:
+                    new_mask |= bit
+                    if value:
+                        true_mask |= bit
+        if new_mask == 0:
+            return pivots, applied
+        kept = []
+        loose = []
+        for bit, mask, parity in pivots:
+            if mask & new_mask:
+                parity ^= bin(mask & true_mask).count("1") & 1
+                mask &= ~new_mask
+            if mask & bit:
+                kept.append((bit, mask, parity))
+            else:
+                loose.append((mask, parity))
+        pivots = self.eliminate_xors(kept, loose)
+        if pivots is None:
+            return None
+        return pivots, applied | new_mask
+
+    def eliminate_xors(self, pivots, rows):
+        """
+        Add the passed (mask, parity) XOR rows to the passed reduced system of
+        (pivot bit, mask, parity) rows, by Gauss-Jordan elimination: each
+        pivot bit appears in its own row and no other. Return the new system,
+        or None if it turns out to be contradictory.
+        """
+        pivots = list(pivots)
+        for mask, parity in rows:
+            for pivot_bit, pivot_mask, pivot_parity in pivots:
+                if mask & pivot_bit:
+                    mask ^= pivot_mask
+                    parity ^= pivot_parity
+            if mask == 0:
+                if parity:
+                    # 0 = 1. Contradiction!
+                    return None
+                continue
+            bit = mask & -mask
+            pivots = [ (b, m ^ mask, p ^ parity) if m & bit else (b, m, p)
+                for b, m, p in pivots ]
+            pivots.append((bit, mask, parity))
+        return pivots
 
     #def elim_easy_doubles: TODO if the same literal appears twice in a clause
     # with the same polarity, remove all but one for convenience. If it appears
     # with *both* polarities, then the clause is trivially true.
 
-    def pure_elim(self, remaining_clauses, assignments):
+    def pure_elim(self, remaining_clauses, assignments, protected=set()):
         """
         For any variable that appears with only one polarity, go ahead and set
-        it to what it needs to be.
+        it to what it needs to be. (Variables in the protected set, like those
+        still in XOR constraints, are left alone.)
         """
         made_progress = False
-        for vn in self.vars:
+        for vn in self.vars - protected:
             cs = [ c for c in remaining_clauses if c.contains_variable(vn) ]
             pols = { c.polarity_of_variable(vn) for c in cs }
             if len(pols) == 0:
@@ -282,79 +590,216 @@ class KB():
                 pass
             if len(pols) == 1:
                 # Great! It's pure. Eliminate it.
-                if list(pols)[0] == 1:
-                    assignments[vn] = True
-                else:
-                    assignments[vn] = False
+                # (Remember that polarity True means negated.)
+                assignments[vn] = not list(pols)[0]
                 for c in cs:
                     remaining_clauses -= {c}
                 made_progress = True
         return made_progress
 
-    def solve_rec(self, remaining_clauses, assignments):
-        self.propagate_units(remaining_clauses, assignments)
+    def solve_rec(self, remaining_clauses, assignments, xor_rows=None,
+            xor_applied=0):
+        self.stats["nodes"] += 1
+        if xor_rows is None:
+            xor_rows = self.eliminate_xors([], self.xors)
+            if xor_rows is None:
+                self.stats["conflicts"] += 1
+                return False
+        # Unit propagation through the clauses can force XOR variables, and
+        # vice versa, so keep alternating until neither learns anything new.
+        while True:
+            if not self.propagate_units(remaining_clauses, assignments):
+                self.stats["conflicts"] += 1
+                return False
+            reduced = self.propagate_xors(xor_rows, xor_applied, assignments)
+            if reduced is None:
+                self.stats["conflicts"] += 1
+                return False
+            xor_rows, xor_applied = reduced
+            units = [ (b, p) for b, m, p in xor_rows if m == b ]
+            if not units:
+                break
+            for bit, parity in units:
+                var = self.xor_var(bit.bit_length() - 1)
+                remaining_clauses |= {Clause.parse(var if parity else "-"+var)}
+        xor_mask = 0
+        for _, mask, _ in xor_rows:
+            xor_mask |= mask
         # As long as we're making progress, keep pure_elim'ing.
-        while self.pure_elim(remaining_clauses, assignments):
+        while self.pure_elim(remaining_clauses, assignments,
+                set(self.xor_members(xor_mask))):
             pass
         if any([ len(c.lits) == 0 for c in remaining_clauses ]):
             # This is a contradiction! Return False.
+            self.stats["conflicts"] += 1
             return False
         remaining_vars = self.vars - set(assignments.keys())
         if len(remaining_vars) == 0:
             return assignments
-        var_to_try = list(remaining_vars)[0]
-        assignments_try_true = deepcopy(assignments)
-        assignments_try_true[var_to_try] = True
-        result = self.solve_rec(remaining_clauses, assignments_try_true)
-        if result:
-            return result
-        assignments_try_false = deepcopy(assignments)
-        assignments_try_true[var_to_try] = False
-        result = self.solve_rec(remaining_clauses, assignments_try_true)
-        if result:
-            return result
+        if not remaining_clauses:
+            # Only (consistent, reduced) XORs are left, so we can read off a
+            # solution: set every non-pivot variable False, and each row's
+            # pivot to its parity.
+            for var in remaining_vars:
+                assignments[var] = False
+            for bit, _, parity in xor_rows:
+                pivot = self.xor_var(bit.bit_length() - 1)
+                assignments[pivot] = bool(parity)
+            return assignments
+        # Branch on a variable that's still in some clause, since that's where
+        # any contradiction has to come from.
+        var_to_try = list(list(remaining_clauses)[0].lits)[0].var
+        for lit in [var_to_try, "-" + var_to_try]:
+            # Try each value by adding it as a unit clause, on a copy of the
+            # clauses, so the other branch starts fresh.
+            self.stats["decisions"] += 1
+            branch_clauses = deepcopy(remaining_clauses)
+            branch_clauses |= {Clause.parse(lit)}
+            result = self.solve_rec(branch_clauses, deepcopy(assignments),
+                xor_rows, xor_applied)
+            if result:
+                return result
         return False
 
 
+    def xor_str(self, mask, parity):
+        xor = " ⊕ ".join(self.xor_members(mask)) or "⊥"
+        return xor if parity else f"¬({xor})"
     def __str__(self):
-        return " ∧ ".join(f"({c})" for c in list(self.clauses))
+        return " ∧ ".join([ f"({c})" for c in list(self.clauses) ] +
+            [ f"({self.xor_str(m, p)})" for m, p in self.xors ])
     def __repr__(self):
-        return f"KB(" + ",\n   ".join([ str(c) for c in self.clauses]) + ")"
+        return f"KB(" + ",\n   ".join([ str(c) for c in self.clauses ] +
+            [ self.xor_str(m, p) for m, p in self.xors ]) + ")"
+
+
+def parse_command(line):
+    """
+    Split the passed command line into a (command, sentence) pair, or return
+    None if it doesn't start with a command word. As at the interactive
+    prompt, any word starting with "a", "t", or "v" (in either case) means
+    ask, tell, or vars, so "A: b" is the same as "ask: b". The batch-only
+    commands retract and audit must be spelled out. Any other word is
+    returned (lowercased) as is.
+    """
+    matches = re.match(r'(?P<cmd>\w+):? ?(?P<sent>.*)', line)
+    if not matches:
+        return None
+    cmd = matches['cmd'].lower()
+    if cmd not in ["retract", "audit"]:
+        cmd = { "a": "ask", "t": "tell", "v": "vars" }.get(cmd[0], cmd)
+    return cmd, matches['sent']
+
+def run_batch(kb, commands, out, with_stats=False):
+    """
+    Carry out each of the passed commands (an iterable of lines, like an open
+    file, in the same form the interactive prompt takes; see parse_command())
+    on the passed KB, and write one line of JSON per command to the passed
+    output file with the command, its result, and how long it took in
+    milliseconds (plus how much work the solver did, if with_stats is True).
+    Blank lines and lines starting with "#" are skipped, and "done" stops
+    early. Only one command is held in memory at a time, so the commands can
+    be arbitrarily long.
+    """
+    for line_num, line in enumerate(commands, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line == "done":
+            break
+        record = { "line": line_num }
+        cmd, sentence = parse_command(line) or (None, None)
+        if cmd:
+            record["cmd"] = cmd
+            if sentence:
+                record["sentence"] = sentence
+        stats_before = dict(kb.stats)
+        start = time.perf_counter()
+        try:
+            if cmd == "ask":
+                record["result"] = kb.ask(sentence)
+            elif cmd == "tell":
+                kb.tell(sentence)
+                record["result"] = None
+            elif cmd == "retract":
+                kb.retract(sentence)
+                record["result"] = None
+            elif cmd == "audit":
+                record["result"] = kb.audit()
+            elif cmd == "vars":
+                record["result"] = sorted(kb.vars)
+            else:
+                record["error"] = f"Didn't understand command '{line}'."
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        if with_stats:
+            record["stats"] = { k: kb.stats[k] - stats_before[k]
+                for k in kb.stats }
+        print(json.dumps(record), file=out)
 
 
 if __name__ == "__main__":
 
     logging.basicConfig(level=logging.WARNING)
 
-    if len(sys.argv) not in [1,2]:
-        sys.exit("Usage: PropKB [prop_logic_file.kb|cnf_file.cnf].")
+    parser = argparse.ArgumentParser(prog="PropKB",
+        description="Experiment with a propositional logic KB.")
+    parser.add_argument("filename", nargs="?",
+        help="prop_logic_file.kb or cnf_file.cnf to start from")
+    parser.add_argument("--batch", action="store_true",
+        help="run the commands on stdin with no prompts, writing results as "
+        "JSON lines")
+    parser.add_argument("--commands", metavar="FILE",
+        help="like --batch, but run the commands in this file")
+    parser.add_argument("--stats", action="store_true",
+        help="in batch mode, include solver stats for each command")
+    args = parser.parse_args()
+    if args.commands:
+        if not os.path.exists(args.commands):
+            sys.exit(f"No such file {args.commands}.")
+        args.batch = True
 
-    if len(sys.argv) == 2:
-        filename = sys.argv[1]
+    if args.filename:
+        filename = args.filename
         if not os.path.exists(filename):
             sys.exit(f"No such file {filename}.")
-        myKB = KB(sys.argv[1])
-        print(f"Loaded {filename}.")
+        myKB = KB(filename)
+        if not args.batch:
+            print(f"Loaded {filename}.")
     else:
         myKB = KB()
-        print("Created empty KB.")
+        if not args.batch:
+            print("Created empty KB.")
+
+    if args.batch:
+        try:
+            if args.commands:
+                with open(args.commands, "r", encoding="utf-8") as f:
+                    run_batch(myKB, f, sys.stdout, args.stats)
+            else:
+                run_batch(myKB, sys.stdin, sys.stdout, args.stats)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # Whatever we were piped into (head, say) has stopped reading.
+            # Point stdout at /dev/null so Python doesn't complain again
+            # when it flushes stdout on the way out.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        sys.exit()
 
     print("Add (additional) facts to the KB like this 'tell: (b ^ c) => d'")
     print("Query the KB like this 'ask: a + -b'")
-    pattern = re.compile(r'(?P<cmd>\w+):? ?(?P<sent>.*)')
     user_input = input("ask/tell/vars (done): ")
     while user_input != "done":
-        matches = pattern.match(user_input)
-        if matches:
-            if matches['cmd'][0] in ['A','a']:
-                print(myKB.ask(matches['sent']))
-            elif matches['cmd'][0] in ['T','t']:
-                myKB.tell(matches['sent'])
-                print("Updated KB.")
-            elif matches['cmd'][0] in ['V','v']:
-                print(f"Vars: {','.join(sorted(myKB.vars))}")
-            else:
-                print(f"Didn't understand command '{user_input}'.")
+        cmd, sentence = parse_command(user_input) or (None, None)
+        if cmd == "ask":
+            print(myKB.ask(sentence))
+        elif cmd == "tell":
+            myKB.tell(sentence)
+            print("Updated KB.")
+        elif cmd == "vars":
+            print(f"Vars: {','.join(sorted(myKB.vars))}")
         else:
             print(f"Didn't understand command '{user_input}'.")
         user_input = input("ask/tell/vars (done): ")
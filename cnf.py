@@ -3,6 +3,7 @@ import sys
 import logging
 import re
 from copy import deepcopy
+from itertools import product
 from PropKB import Literal, Clause, KB
 
 class Node():
@@ -107,6 +108,82 @@ def convert_to_cnf(s):
     """
     tokens = tokenize(s)
     tree = parse(tokens)
+    return tree_to_cnf(tree)
+
+
+def convert_to_cnf_and_xors(s):
+    """
+    Given a sentence (string) of propositional logic, return a pair: a set of
+    Clause objects, and a list of XOR constraints, which together represent
+    its equivalent. Each top-level conjunct that is nothing but an XOR of
+    literals (like "a ⊕ -b ⊕ c") becomes an XOR constraint, in the form of a
+    (set of variables, parity) pair meaning "an odd number of these are True"
+    if parity is 1, "an even number" if 0. Everything else is converted to
+    CNF as usual.
+    """
+    tokens = tokenize(s)
+    tree = parse(tokens)
+    xors = []
+    others = []
+    for conjunct in top_level_conjuncts(tree):
+        xor = xor_terms(conjunct)
+        if xor is not None  and  contains_xor(conjunct):
+            xors.append(xor)
+        else:
+            others.append(conjunct)
+    clauses = set()
+    for conjunct in others:
+        clauses |= tree_to_cnf(conjunct)
+    return clauses, xors
+
+
+def top_level_conjuncts(tree):
+    """
+    Given a parse tree, return a list of the subtrees that are and-ed together
+    at its top.
+    """
+    if type(tree) is Node  and  tree.me == "^":
+        return top_level_conjuncts(tree.left) + top_level_conjuncts(tree.right)
+    return [tree]
+
+
+def contains_xor(tree):
+    if type(tree) is not Node:
+        return False
+    return (tree.me == "⊕"  or  contains_xor(tree.left)  or
+        contains_xor(tree.right))
+
+
+def xor_terms(tree):
+    """
+    If the parse tree passed consists of only xors and nots of variables,
+    return the (set of variables, parity) pair it's equivalent to: it's True
+    exactly when the number of True variables in the set has that parity.
+    Otherwise, return None.
+    """
+    if type(tree) is str:
+        return {tree}, 1
+    if tree.me == "-":
+        terms = xor_terms(tree.right)
+        if terms is None:
+            return None
+        return terms[0], 1 - terms[1]
+    if tree.me == "⊕":
+        left = xor_terms(tree.left)
+        right = xor_terms(tree.right)
+        if left is None or right is None:
+            return None
+        # Variables appearing on both sides cancel out, and (x=1)⊕(y=1) is
+        # the same as x⊕y=0.
+        return left[0] ^ right[0], 1 - (left[1] ^ right[1])
+    return None
+
+
+def tree_to_cnf(tree):
+    """
+    Given a parse tree (root Node) of propositional logic, return a set of
+    Clause objects representing its equivalent in CNF.
+    """
     tree = eliminate_equiv(tree)
     tree = eliminate_implies(tree)
     tree = eliminate_xors(tree)
@@ -126,6 +203,54 @@ def convert_to_cnf(s):
     return extract_clauses(tree)
 
 
+def xors_to_clauses(xors, taken_vars=set(), cut=None):
+    """
+    Given a list of XOR constraints, as (list of variables, parity) pairs,
+    return a set of Clauses equivalent to them. By default each XOR is
+    expressed directly, which for an XOR of k variables takes 2^(k-1)
+    clauses. If a cut length is passed, any XOR longer than that is first
+    chopped into pieces, chained together with new "cut" variables (named
+    _xor1, _xor2, ..., skipping any in taken_vars), each defined as the XOR
+    of the piece before it. The cut variables don't change the number of
+    models, since each one's value is fixed by the others.
+    """
+    if cut is None:
+        return set().union(*[ xor_to_clauses(list(members), parity)
+            for members, parity in xors ])
+    if cut < 3:
+        raise ValueError("Cut length must be at least 3.")
+    clauses = set()
+    num_cuts = 0
+    for members, parity in xors:
+        members = list(members)
+        while len(members) > cut:
+            num_cuts += 1
+            while f"_xor{num_cuts}" in taken_vars:
+                num_cuts += 1
+            cut_var = f"_xor{num_cuts}"
+            clauses |= xor_to_clauses(members[:cut-1] + [cut_var], 0)
+            members = [cut_var] + members[cut-1:]
+        clauses |= xor_to_clauses(members, parity)
+    return clauses
+
+
+def xor_to_clauses(variables, parity):
+    """
+    Return the set of Clauses that directly expresses the constraint that an
+    odd (if parity is 1) or even (if parity is 0) number of the passed
+    variables are True: one clause ruling out each assignment with the wrong
+    parity.
+    """
+    clauses = set()
+    for vals in product([True,False], repeat=len(variables)):
+        if sum(vals) % 2 != parity:
+            clause = Clause()
+            for var, val in zip(variables, vals):
+                clause.add_literal(Literal("-" + var if val else var))
+            clauses |= {clause}
+    return clauses
+
+
 def extract_clauses(tree):
     if type(tree) is str:
         return {Clause.parse(tree)}
@@ -295,7 +420,7 @@ def parse(tokens):
                 make_node(ops, operands)
             ops.append('^')
         elif token in ['-','¬']:
-            while ops and ops[-1] not in ['(','[','<=>','=>','+','^','∧']:
+            while ops and ops[-1] not in ['(','[','<=>','=>','+','⊕','^','∧']:
                 make_node(ops, operands)
             ops.append('-')
         elif token in ['(','[']:
@@ -0,0 +1,397 @@
+import sys
+import logging
+import threading
+from collections import defaultdict
+
+# Exact (weighted) model counting for sets of Clauses. The counter is a DPLL
+# search that, instead of stopping at the first solution, adds up the models
+# of both branches. Several things keep it from being exponential on the kind
+# of KBs we build for Wumpus-style worlds:
+#
+#   - Preprocessing: unit clauses are propagated up front, and variables
+#     whose value is fixed by the others (like a breeze defined as "B <=> (P1
+#     + P2 + ...)" that's never been observed) are resolved away, since they
+#     don't change the count.
+#   - Component decomposition: if the remaining clauses split into groups
+#     that share no variables, each group is counted separately and the
+#     counts are multiplied. To make that happen early and often, we branch
+#     on variables in (reverse) min-degree elimination order, so that the
+#     variables holding the problem together get assigned first.
+#   - Component caching: every component's count is remembered, keyed by its
+#     (canonical) set of clauses, so the same sub-problem reached by different
+#     branches -- or by later counts on the same KB (see CountCache) -- is
+#     only ever counted once.
+#
+# Internally a literal is a nonzero int (+i for variable i, -i for its
+# negation), and a clause is a frozenset of those. A set of clauses is a
+# frozenset of clauses, which doubles as its own cache key.
+
+class CountCache():
+    """
+    What's worth remembering from one count to the next (on the same KB,
+    with the same weights): a fixed numbering of the variables, and the count
+    of every component seen so far. A component's count depends only on its
+    own clauses (and the weights), so these stay correct no matter what the
+    KB is told later.
+
+    One CountCache can be used by counts running at the same time in
+    different threads (as in kb_server.py): the numbering is handed out, and
+    counts is swapped for an empty dict when it gets too big, under the
+    lock. (Adding to counts and looking things up in it needn't be, since a
+    component's count is the same whichever thread works it out.)
+    """
+    def __init__(self, limit=200000):
+        self.var_nums = {}
+        self.counts = {}
+        self.limit = limit
+        self.lock = threading.Lock()
+    def numbers(self, variables):
+        """
+        Return a dict from each of the passed variables to its number.
+        """
+        with self.lock:
+            for v in sorted(variables):
+                if v not in self.var_nums:
+                    self.var_nums[v] = len(self.var_nums) + 1
+            return { v:self.var_nums[v] for v in variables }
+
+def count_models(clauses, variables, weights=None, xors=(), cache=None):
+    """
+    Given a collection of Clause objects, and the set of variables to count
+    assignments over, return the number of assignments to those variables
+    that satisfy every clause. (Variables that appear in no clause are free
+    and each double the count.)
+
+    If a dict of weights is passed, it maps variables to the probability
+    they're True, and the return value is the weighted model count instead:
+    the sum, over satisfying assignments, of the product of each variable's
+    weight (p if True, 1-p if False). Variables with no weight given count
+    as 1 either way.
+
+    Any XOR constraints passed, as (list of variables, parity) pairs, must
+    hold too (see reduce_xors()).
+
+    Pass the same CountCache to counts of related clause sets with the same
+    weights, to reuse what earlier counts learned.
+    """
+    if cache is None:
+        cache = CountCache()
+    variables = set(variables)
+    for c in clauses:
+        variables |= c.get_vars()
+    for xor_vars, _ in xors:
+        variables |= set(xor_vars)
+    if xors:
+        from cnf import xors_to_clauses
+        reduced = reduce_xors(xors, clauses, weights)
+        if reduced is None:
+            return 0
+        xors, eliminated = reduced
+        variables -= eliminated
+        # Whatever XORs are left are cut into short pieces, since their
+        # direct CNF grows exponentially with their length.
+        clauses = set(clauses) | xors_to_clauses(xors, variables, cut=4)
+        for c in clauses:
+            variables |= c.get_vars()
+    var_nums = cache.numbers(variables)
+    lit_weights = {}
+    for v,i in var_nums.items():
+        if weights and v in weights:
+            lit_weights[i] = weights[v]
+            lit_weights[-i] = 1 - weights[v]
+        else:
+            lit_weights[i] = 1
+            lit_weights[-i] = 1
+
+    int_clauses = set()
+    for c in clauses:
+        int_clause = frozenset(
+            -var_nums[l.var] if l.neg else var_nums[l.var] for l in c.lits)
+        if any([ -l in int_clause for l in int_clause ]):
+            # Tautology (a ∨ ¬a ∨ ...) -- can never be violated.
+            continue
+        int_clauses.add(int_clause)
+    int_clauses = frozenset(int_clauses)
+
+    factor, int_clauses, gone = preprocess(int_clauses, lit_weights)
+    if factor == 0:
+        return 0
+
+    # Our search recurses (at most) once per variable.
+    if sys.getrecursionlimit() < 2 * len(var_nums) + 100:
+        sys.setrecursionlimit(2 * len(var_nums) + 100)
+
+    with cache.lock:
+        if len(cache.counts) > cache.limit:
+            # Counts already under way keep the old dict, so don't clear it.
+            cache.counts = {}
+        counts = cache.counts
+    result = factor * count_rec(int_clauses, lit_weights, counts,
+        elimination_ranks(int_clauses))
+    used = { abs(l) for c in int_clauses for l in c }
+    for i in var_nums.values():
+        if i not in used  and  i not in gone:
+            result *= lit_weights[i] + lit_weights[-i]
+    logging.debug(f"Counted {len(var_nums)} vars, {len(cache.counts)} cached "
+        "comps.")
+    return result
+
+def preprocess(clauses, lit_weights):
+    """
+    Simplify the passed frozenset of int clauses without changing its
+    (weighted) count, except by a constant factor. Unit clauses are
+    propagated, and any unweighted variable that's defined by the clauses
+    it's in (its value is fixed by the other variables in them) is resolved
+    away. Return a triple: the factor, the simplified clauses, and the set of
+    variables that were assigned or resolved away (and so aren't free, even
+    though they no longer appear in the clauses). If the clauses turn out to
+    be contradictory, the factor will be 0.
+    """
+    factor = 1
+    gone = set()
+    defined = {}
+    changed = True
+    while changed:
+        changed = False
+        units = [ next(iter(c)) for c in clauses if len(c) == 1 ]
+        while units:
+            clauses, assigned = assign(clauses, units[0])
+            if clauses is None:
+                return 0, frozenset(), gone
+            for l in assigned:
+                factor *= lit_weights[l]
+                gone.add(abs(l))
+            units = [ next(iter(c)) for c in clauses if len(c) == 1 ]
+
+        occurrences = defaultdict(set)
+        for c in clauses:
+            for l in c:
+                occurrences[l].add(c)
+        clauses = set(clauses)
+        for var in sorted({ abs(l) for l in occurrences },
+                key=lambda v: len(occurrences[v]) + len(occurrences[-v])):
+            if lit_weights[var] != 1  or  lit_weights[-var] != 1:
+                continue
+            pos = set(occurrences[var])
+            neg = set(occurrences[-var])
+            if not pos  or  not neg:
+                continue
+            # The variable is defined if there's no way to satisfy all of the
+            # clauses it's in with it left out (so that both of its values
+            # would work).
+            residue = frozenset([ c - {var} for c in pos ] +
+                [ c - {-var} for c in neg ])
+            if residue not in defined:
+                residue_vars = { abs(l) for c in residue for l in c }
+                defined[residue] = (len(residue_vars) <= 12  and
+                    count_rec(residue, { l:1 for v in residue_vars
+                        for l in [v,-v] }, {}, {}) == 0)
+            if not defined[residue]:
+                continue
+            resolvents = set()
+            for p in pos:
+                for n in neg:
+                    resolvent = (p - {var}) | (n - {-var})
+                    if not any([ -l in resolvent for l in resolvent ]):
+                        resolvents.add(resolvent)
+            if len(resolvents) > len(pos) + len(neg):
+                continue
+            for c in pos | neg:
+                clauses.discard(c)
+                for l in c:
+                    occurrences[l].discard(c)
+            for c in resolvents - clauses:
+                clauses.add(c)
+                for l in c:
+                    occurrences[l].add(c)
+            gone.add(var)
+            changed = True
+        clauses = frozenset(clauses)
+    return factor, frozenset(clauses), gone
+
+def elimination_ranks(clauses):
+    """
+    Return a dict from each variable in the passed int clauses to its place
+    in a min-degree elimination order: repeatedly pick the variable sharing
+    clauses with the fewest others, and connect all of its neighbors to each
+    other. Variables eliminated last are the ones holding everything
+    together, so they're the ones to branch on first.
+    """
+    neighbors = defaultdict(set)
+    for c in clauses:
+        vs = { abs(l) for l in c }
+        for v in vs:
+            neighbors[v] |= vs - {v}
+    ranks = {}
+    remaining = set(neighbors)
+    while remaining:
+        var = min(remaining, key=lambda v: (len(neighbors[v]), v))
+        for n in neighbors[var]:
+            neighbors[n] |= neighbors[var] - {n}
+            neighbors[n].discard(var)
+        ranks[var] = len(ranks)
+        remaining.remove(var)
+    return ranks
+
+def reduce_xors(xors, clauses, weights=None):
+    """
+    Simplify the passed XOR constraints (as (list of variables, parity)
+    pairs) by Gauss-Jordan elimination, choosing as pivots, wherever
+    possible, variables that are in none of the passed clauses and have no
+    weight. Each such pivot's value is fixed by the rest of its row, and it
+    appears nowhere else, so it and its row can be dropped without changing
+    the (weighted) count. Return a pair: the XORs that are left, and the set
+    of variables eliminated. If the XORs contradict each other, return None.
+    """
+    clause_vars = set()
+    for c in clauses:
+        clause_vars |= c.get_vars()
+    xor_vars = sorted({ v for members, _ in xors for v in members })
+    index = { v:i for i,v in enumerate(xor_vars) }
+    eligible = 0
+    for v in xor_vars:
+        if v not in clause_vars  and  not (weights and v in weights):
+            eligible |= 1 << index[v]
+
+    pivots = []
+    for members, parity in xors:
+        mask = 0
+        for v in members:
+            mask ^= 1 << index[v]
+        for pivot_bit, pivot_mask, pivot_parity in pivots:
+            if mask & pivot_bit:
+                mask ^= pivot_mask
+                parity ^= pivot_parity
+        if mask == 0:
+            if parity:
+                return None
+            continue
+        candidates = mask & eligible or mask
+        bit = candidates & -candidates
+        pivots = [ (b, m ^ mask, p ^ parity) if m & bit else (b, m, p)
+            for b, m, p in pivots ]
+        pivots.append((bit, mask, parity))
+
+    left = []
+    eliminated = set()
+    for bit, mask, parity in pivots:
+        if bit & eligible:
+            eliminated.add(xor_vars[bit.bit_length() - 1])
+        else:
+            left.append(([ v for v in xor_vars if mask & 1 << index[v] ],
+                parity))
+    return left, eliminated
+
+def count_rec(clauses, lit_weights, cache, ranks, split=True):
+    """
+    Return the weighted model count of the passed frozenset of int clauses,
+    over exactly the variables that appear in them. Branch on the variable
+    with the highest of the passed ranks (variables with none come first).
+    If split is False, the clauses are known to be one connected component.
+    """
+    if not clauses:
+        return 1
+    if frozenset() in clauses:
+        return 0
+    cached = cache.get(clauses)
+    if cached is not None:
+        return cached
+
+    if split:
+        components = split_components(clauses)
+        if len(components) > 1:
+            result = 1
+            for component in components:
+                result *= count_rec(component, lit_weights, cache, ranks,
+                    False)
+                if result == 0:
+                    break
+            cache[clauses] = result
+            return result
+
+    all_vars = { abs(l) for c in clauses for l in c }
+    var = max(all_vars, key=lambda v: ranks.get(v, len(ranks)))
+    result = 0
+    for lit in [var, -var]:
+        reduced, assigned = assign(clauses, lit)
+        if reduced is None:
+            continue
+        # Only look for a split if some clauses went away, which is when one
+        # is likely. (Skipping a check only costs a missed opportunity.)
+        branch = count_rec(reduced, lit_weights, cache, ranks,
+            len(reduced) < len(clauses))
+        if branch == 0:
+            continue
+        for l in assigned:
+            branch *= lit_weights[l]
+        # Variables that vanished from the clauses without being assigned are
+        # now free.
+        left = { abs(l) for c in reduced for l in c }
+        for v in all_vars - left - { abs(l) for l in assigned }:
+            branch *= lit_weights[v] + lit_weights[-v]
+        result += branch
+    cache[clauses] = result
+    return result
+
+def assign(clauses, lit):
+    """
+    Set the passed literal true in the passed frozenset of int clauses, and
+    follow up with unit propagation. Return a pair: the simplified clauses and
+    the set of literals that were set along the way. If a contradiction is
+    found, the simplified clauses will be None.
+    """
+    occurrences = defaultdict(list)
+    for c in clauses:
+        for l in c:
+            occurrences[l].append(c)
+    assigned = set()
+    to_set = [lit]
+    while to_set:
+        lit = to_set.pop()
+        if lit in assigned:
+            continue
+        if -lit in assigned:
+            return None, assigned
+        assigned.add(lit)
+        # Only the clauses containing the negation can have become unit (or
+        # empty).
+        for c in occurrences[-lit]:
+            if any([ l in assigned for l in c ]):
+                continue
+            left = [ l for l in c if -l not in assigned ]
+            if not left:
+                return None, assigned
+            if len(left) == 1:
+                to_set.append(left[0])
+    negations = { -l for l in assigned }
+    new_clauses = set()
+    for c in clauses:
+        if c.isdisjoint(assigned):
+            new_clauses.add(c - negations if not c.isdisjoint(negations)
+                else c)
+    return frozenset(new_clauses), assigned
+
+def split_components(clauses):
+    """
+    Partition the passed frozenset of int clauses into a list of frozensets
+    that share no variables with each other.
+    """
+    parent = {}
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+    for c in clauses:
+        vs = [ abs(l) for l in c ]
+        for v in vs:
+            parent.setdefault(v, v)
+        root = find(vs[0])
+        for v in vs[1:]:
+            other = find(v)
+            if other != root:
+                parent[other] = root
+    groups = defaultdict(set)
+    for c in clauses:
+        groups[find(abs(next(iter(c))))].add(c)
+    return [ frozenset(g) for g in groups.values() ]
@@ -0,0 +1,87 @@
+import json
+import socket
+
+class KBServerError(Exception):
+    pass
+
+class KBClient():
+    """
+    A connection to a KB server (see kb_server.py), with the same methods as
+    a KB. Everything told to or retracted from it is private to this
+    connection, on top of the KB the server shares among all its clients.
+    """
+    def __init__(self, where):
+        """
+        Connect to the server listening on the passed TCP port (on localhost)
+        if it's a number, or else on the Unix socket at the passed path.
+        """
+        if str(where).isdigit():
+            self.sock = socket.create_connection(("localhost", int(where)))
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(where)
+        self.file = self.sock.makefile("rwb")
+
+    def request(self, cmd, arg=None):
+        """
+        Send the passed command (and argument, if any) to the server, and
+        return its result.
+        """
+        line = cmd if arg is None else f"{cmd}: {arg}"
+        if "\n" in line:
+            raise ValueError("Commands can't contain newlines.")
+        self.file.write((line + "\n").encode("utf-8"))
+        self.file.flush()
+        response = self.file.readline()
+        if not response:
+            raise KBServerError("Server closed the connection.")
+        response = json.loads(response)
+        if not response["ok"]:
+            raise KBServerError(response["error"])
+        return response["result"]
+
+    def tell(self, fact):
+        self.request("tell", fact)
+
+    def retract(self, fake_news):
+        self.request("retract", fake_news)
+
+    def ask(self, hypothesis):
+        return self.request("ask", hypothesis)
+
+    def can_prove(self, hypothesis):
+        return self.request("can_prove", hypothesis)
+
+    def audit(self):
+        return self.request("audit")
+
+    def get_solution(self):
+        return self.request("get_solution")
+
+    def count_models(self, weights=None):
+        return self.request("count_models",
+            json.dumps(weights) if weights else None)
+
+    def probability(self, hypothesis, weights=None):
+        if weights:
+            hypothesis += "\t" + json.dumps(weights)
+        return self.request("probability", hypothesis)
+
+    @property
+    def vars(self):
+        return set(self.request("vars"))
+
+    def reset(self):
+        """
+        Forget everything told to or retracted from this connection so far.
+        """
+        self.request("reset")
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,207 @@
+import sys
+import os
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from PropKB import KB
+
+# A server that lets many agents share one (big, slow-to-load) KB. Each
+# connection gets its own session: a .fork() of the shared KB, so whatever a
+# session .tell()s or .retract()s is seen by that session only.
+#
+# The protocol is one command per line, in the same form as the PropKB.py
+# command line ("tell: a => b", "ask: a + -b", "audit", ...), and one JSON
+# response per line: {"ok": true, "result": ...} or {"ok": false, "error":
+# "..."}. The commands are named after the KB methods they call:
+#
+#   tell: <sentence>            retract: <sentence>
+#   ask: <sentence>             can_prove: <sentence>
+#   audit                       get_solution
+#   count_models[: <weights>]   probability: <sentence>[<TAB><weights>]
+#   vars                        reset (forget this session's changes)
+#
+# where <weights> is a JSON object mapping variables to probabilities.
+#
+# Every command runs in a pool of worker threads, so a slow one doesn't hold
+# up anybody else's. (Even .tell() and .retract() can be slow, on big
+# sentences.) Each session waits for one command to finish before reading the
+# next, so a session's commands are still carried out in the order sent. And
+# since most sessions query the shared KB without having changed it,
+# identical queries arriving at the same time are only solved once.
+
+QUERIES = ["ask", "can_prove", "audit", "get_solution", "count_models",
+    "probability"]
+
+# The longest command line we'll take, in bytes. (asyncio's default, 64 KiB,
+# is too short for telling a big KB in one go.)
+LINE_LIMIT = 16 * 1024 * 1024
+
+class KBServer():
+    def __init__(self, kb, max_workers=None):
+        self.kb = kb
+        self.executor = ThreadPoolExecutor(max_workers)
+        # Queries being solved right now, keyed by (KB, command, argument).
+        self.in_flight = {}
+
+    async def handle_session(self, reader, writer):
+        session = self.kb.fork()
+        peer = writer.get_extra_info("peername") or "local client"
+        logging.info(f"Session opened for {peer}.")
+        try:
+            while True:
+                try:
+                    line = await read_line(reader)
+                except ValueError as e:
+                    # Too long, or not UTF-8. Either way, it's been skipped.
+                    logging.warning(f"Bad line from {peer}: {e}")
+                    await send(writer, {"ok": False,
+                        "error": f"{type(e).__name__}: {e}"})
+                    continue
+                if line is None:
+                    break
+                if not line:
+                    continue
+                if line == "reset":
+                    session = self.kb.fork()
+                    response = {"ok": True, "result": None}
+                else:
+                    response = await self.handle_command(session, line)
+                await send(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            logging.info(f"Session closed for {peer}.")
+            writer.close()
+
+    async def handle_command(self, session, line):
+        """
+        Carry out the passed command line on the passed session (KB), and
+        return the response to send back.
+        """
+        cmd, _, arg = line.partition(":")
+        cmd = cmd.strip().lower()
+        arg = arg.strip()
+        loop = asyncio.get_running_loop()
+        try:
+            if cmd in ["tell", "retract"]:
+                await loop.run_in_executor(self.executor,
+                    getattr(session, cmd), arg)
+                result = None
+            elif cmd == "vars":
+                result = await loop.run_in_executor(self.executor,
+                    lambda: sorted(session.vars))
+            elif cmd in QUERIES:
+                result = await self.query(session, cmd, arg)
+            else:
+                return {"ok": False, "error": f"No such command '{cmd}'."}
+        except Exception as e:
+            logging.warning(f"'{line}' failed: {e!r}")
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": True, "result": result}
+
+    async def query(self, session, cmd, arg):
+        """
+        Run the passed query command in the worker pool, and return its
+        result. If the session hasn't changed anything, ask the shared KB
+        instead, so that identical queries from different sessions can be
+        answered by one solver run.
+        """
+        kb = session if has_changes(session) else self.kb
+        key = (id(kb), cmd, arg)
+        if key in self.in_flight:
+            logging.debug(f"Coalescing '{cmd}: {arg}'.")
+            return await asyncio.shield(self.in_flight[key])
+        if cmd == "count_models":
+            args = [json.loads(arg)] if arg else []
+        elif cmd == "probability":
+            hypothesis, _, weights = arg.partition("\t")
+            args = [hypothesis] + ([json.loads(weights)] if weights else [])
+        elif cmd in ["audit", "get_solution"]:
+            args = []
+        else:
+            args = [arg]
+        future = asyncio.get_running_loop().run_in_executor(self.executor,
+            getattr(kb, cmd), *args)
+        self.in_flight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+
+    async def serve(self, where):
+        """
+        Listen on the passed TCP port (on localhost) if it's a number, or
+        else on a Unix socket at the passed path, until cancelled.
+        """
+        if str(where).isdigit():
+            server = await asyncio.start_server(self.handle_session,
+                "localhost", int(where), limit=LINE_LIMIT)
+        else:
+            server = await asyncio.start_unix_server(self.handle_session,
+                where, limit=LINE_LIMIT)
+        logging.info(f"Serving on {where}.")
+        async with server:
+            await server.serve_forever()
+
+
+async def read_line(reader):
+    """
+    Return the next line from the passed StreamReader, decoded and stripped,
+    or None at the end of the stream. If the line is longer than the reader's
+    limit, or isn't UTF-8, skip the whole of it and raise ValueError.
+    """
+    too_long = False
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # The stream ended, maybe partway through a line.
+            line = e.partial
+            if not line:
+                return None
+        except asyncio.LimitOverrunError as e:
+            # Throw away what we've got so far, and keep looking for the end.
+            too_long = True
+            await reader.readexactly(e.consumed)
+            continue
+        if too_long:
+            raise ValueError("Line too long.")
+        return line.decode("utf-8").strip()
+
+
+async def send(writer, response):
+    """
+    Send the passed response to the client on the other end of the passed
+    StreamWriter, as one line of JSON.
+    """
+    writer.write((json.dumps(response) + "\n").encode("utf-8"))
+    await writer.drain()
+
+
+def has_changes(fork):
+    """
+    Return True if the passed fork has told or retracted anything.
+    """
+    return bool(fork.own_vars or fork.own_clauses or fork.removed_clauses or
+        fork.own_xors or fork.removed_xors)
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) != 3:
+        sys.exit("Usage: kb_server.py prop_logic_file.kb|cnf_file.cnf "
+            "port|socket_path.")
+
+    filename = sys.argv[1]
+    if not os.path.exists(filename):
+        sys.exit(f"No such file {filename}.")
+    server = KBServer(KB(filename))
+    logging.info(f"Loaded {filename}.")
+    try:
+        asyncio.run(server.serve(sys.argv[2]))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,33 @@
+from PropKB import KB
+
+# Regression checks for forks whose parent is told more XORs after forking.
+# Run with "python -m pytest".
+
+def fork_then_change_parent():
+    kb = KB()
+    kb.tell("a + b")
+    fork = kb.fork()
+    fork.tell("z ⊕ c")
+    kb.tell("z ⊕ d")
+    return kb, fork
+
+def test_xor_variable_has_one_bit_in_fork_and_parent():
+    kb, fork = fork_then_change_parent()
+    assert kb.xor_mask(["z"]) == fork.xor_mask(["z"])
+    assert sorted([ sorted(m) for m, p in fork.xor_list() ]) == \
+        [["c", "z"], ["d", "z"]]
+
+def test_fork_solution_satisfies_fork():
+    kb, fork = fork_then_change_parent()
+    solution = fork.get_solution()
+    assert solution
+    assert fork.evalu({ **{ v:False for v in fork.vars }, **solution })
+
+def test_fork_sees_parent_xor():
+    kb, fork = fork_then_change_parent()
+    fork.tell("z")
+    assert fork.ask("c") == False
+    assert fork.ask("d") == False
+    assert kb.ask("d") == "IDK"
+    assert fork.count_models() == 3
+    assert kb.count_models() == 6